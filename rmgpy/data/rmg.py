@@ -83,7 +83,8 @@ class RMGDatabase:
              statmechLibraries=None,
              depository=True,
              solvation=True,
-             testing = False):
+             testing = False,
+             solvationCachePath=None):
         """
         Load the RMG database from the given `path` on disk, where `path`
         points to the top-level folder of the RMG database. If none of the
@@ -92,6 +93,10 @@ class RMGDatabase:
         components of the database be loaded.
 
         Argument testing will load a lighter version of the database used for unit-tests
+
+        If `solvationCachePath` is given, the solvation database is pickled to
+        that file and reloaded from it on later runs (see
+        :meth:`SolvationDatabase.load`).
         """
         self.loadThermo(os.path.join(path, 'thermo'), thermoLibraries, depository)
         if not testing:
@@ -107,7 +112,7 @@ class RMGDatabase:
             self.loadStatmech(os.path.join(path, 'statmech'), statmechLibraries, depository)
         
         if solvation:
-            self.loadSolvation(os.path.join(path, 'solvation'))
+            self.loadSolvation(os.path.join(path, 'solvation'), solvationCachePath)
 
     def loadThermo(self, path, thermoLibraries=None, depository=True):
         """
@@ -173,13 +178,14 @@ class RMGDatabase:
 
         broadcast(self.kinetics, 'kinetics')
 
-    def loadSolvation(self, path):
+    def loadSolvation(self, path, cachePath=None):
         """
         Load the RMG solvation database from the given `path` on disk, where
         `path` points to the top-level folder of the RMG solvation database.
+        If a `cachePath` is given, the database is cached in that file.
         """
         self.solvation = SolvationDatabase()
-        self.solvation.load(path)
+        self.solvation.load(path, cachePath=cachePath)
         broadcast(self.solvation, 'solvation')
         
     def loadStatmech(self, path, statmechLibraries=None, depository=True):
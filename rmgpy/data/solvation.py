@@ -33,17 +33,85 @@
 """
 
 import os.path
+import sys
 import math
 import logging
+import cPickle
+import numpy
+from collections import OrderedDict
 import rmgpy.constants as constants
+from rmgpy.version import __version__
 from rmgpy.species import Species
-from copy import deepcopy
 from base import Database, Entry, makeLogicNode, DatabaseError
 
 from rmgpy.molecule import Molecule, Atom, Bond, Group, atomTypes
 
 ################################################################################
 
+# McGowan characteristic atomic volumes in cm^3/mol, indexed by atomic number.
+# Elements without a tabulated value are left as NaN.
+# See Table 2 in Abraham & McGowan, Chromatographia Vol. 23, No. 4, p. 243. April 1987
+_mcGowanVolumes = numpy.empty(128)
+_mcGowanVolumes.fill(numpy.nan)
+_mcGowanVolumes[1] = 8.71   # H
+_mcGowanVolumes[6] = 16.35  # C
+_mcGowanVolumes[7] = 14.39  # N
+_mcGowanVolumes[8] = 12.43  # O
+_mcGowanVolumes[9] = 10.48  # F
+_mcGowanVolumes[14] = 26.83 # Si
+_mcGowanVolumes[15] = 24.87 # P
+_mcGowanVolumes[16] = 22.91 # S
+_mcGowanVolumes[17] = 20.95 # Cl
+_mcGowanVolumes[35] = 26.21 # Br
+_mcGowanVolumes[53] = 34.53 # I
+
+# Converts log10 of the partition coefficient K to the Gibbs free energy of
+# solvation in J/mol at 298 K, i.e. -RT*ln(10)
+_gibbsPerLogK = -8.314*298*2.303
+
+# Converts the Mintz enthalpy of solvation (kJ/mol) and the Abraham log K
+# computed from SolventData.coefficients to J/mol
+_solvationUnits = numpy.array([1000., _gibbsPerLogK])
+
+# The maximum number of group additivity estimates kept by each SolvationDatabase
+_soluteCacheSize = 20000
+
+# The byte of the formula key used to count each element, by atomic number.
+# All other elements share the last byte.
+_formulaKeyBytes = {6: 0, 1: 1, 7: 2, 8: 3, 9: 4, 16: 5, 17: 6}
+
+def getFormulaKey(molecule):
+    """
+    Return the molecular formula of `molecule` packed into a single integer,
+    with one byte holding the number of atoms of each of C, H, N, O, F, S and
+    Cl and the last byte holding the number of any other atoms. Counts above
+    255 saturate. Isomorphic molecules always have the same key, so comparing
+    keys is a quick way to rule out isomorphism.
+    """
+    counts = [0] * 8
+    for atom in molecule.atoms:
+        counts[_formulaKeyBytes.get(atom.element.number, 7)] += 1
+    key = 0
+    for i, count in enumerate(counts):
+        key |= min(count, 255) << (8 * i)
+    return key
+
+def _descriptorVector(S, B, E, L, A):
+    """
+    Return the five Abraham descriptors (or the solvent coefficients that
+    multiply them) as a numpy vector. Missing values are stored as NaN.
+    """
+    return numpy.array([numpy.nan if x is None else x for x in (S, B, E, L, A)], numpy.float64)
+
+def _descriptorValue(value):
+    """
+    Return an element of a descriptor vector as a float, or ``None`` if it is
+    missing (NaN).
+    """
+    return None if numpy.isnan(value) else float(value)
+
+################################################################################
+
 def saveEntry(f, entry):
     """
     Write a Pythonic string representation of the given `entry` in the solvation
@@ -138,25 +206,31 @@ def processOldLibraryEntry(data):
     raise NotImplementedError()
 
 
-class SolventData():
+class SolventData(object):
     """
     Stores Abraham/Mintz parameters for characterizing a solvent.
+
+    The enthalpy (Mintz) and Gibbs free energy (Abraham) coefficients of the
+    S, B, E, L and A solute descriptors are stored as the columns of the
+    5x2 matrix `coefficients`, in the same order as :attr:`SoluteData.vec`,
+    and the two constants as `intercepts`, so that both linear free energy
+    relationships reduce to a single dot product. Missing values are stored
+    as NaN. The individual coefficients and the vectors `h_vec` and `g_vec`
+    are read-only views of these arrays. Whether all of the Mintz and all of
+    the Abraham parameters are present is recorded in `hasMintz` and
+    `hasAbraham`.
     """
+    __slots__ = ('coefficients', 'intercepts', 'hasMintz', 'hasAbraham', 'A', 'B', 'C', 'D', 'E', 'alpha', 'beta', 'eps')
+
     def __init__(self, s_h=None, b_h=None, e_h=None, l_h=None, a_h=None,
     c_h=None, s_g=None, b_g=None, e_g=None, l_g=None, a_g=None, c_g=None, A=None, B=None, 
     C=None, D=None, E=None, alpha=None, beta=None, eps=None):
-        self.s_h = s_h
-        self.b_h = b_h
-        self.e_h = e_h
-        self.l_h = l_h
-        self.a_h = a_h
-        self.c_h = c_h
-        self.s_g = s_g
-        self.b_g = b_g
-        self.e_g = e_g
-        self.l_g = l_g
-        self.a_g = a_g
-        self.c_g = c_g
+        self.coefficients = numpy.column_stack((_descriptorVector(s_h, b_h, e_h, l_h, a_h),
+                                                _descriptorVector(s_g, b_g, e_g, l_g, a_g)))
+        self.coefficients.flags.writeable = False
+        self.intercepts = numpy.array([numpy.nan if c is None else c for c in (c_h, c_g)], numpy.float64)
+        self.intercepts.flags.writeable = False
+        self.hasMintz, self.hasAbraham = ~numpy.isnan(numpy.vstack((self.coefficients, self.intercepts))).any(axis=0)
         # These are parameters for calculating viscosity
         self.A = A
         self.B = B
@@ -168,7 +242,57 @@ class SolventData():
         self.beta = beta
         # This is the dielectric constant
         self.eps = eps
-    
+
+    def __reduce__(self):
+        """
+        A helper function used when pickling a SolventData object.
+        """
+        return (SolventData, (self.s_h, self.b_h, self.e_h, self.l_h, self.a_h, self.c_h,
+                              self.s_g, self.b_g, self.e_g, self.l_g, self.a_g, self.c_g,
+                              self.A, self.B, self.C, self.D, self.E, self.alpha, self.beta, self.eps))
+
+    def __getH_vec(self): return self.coefficients[:,0]
+    h_vec = property(__getH_vec)
+
+    def __getG_vec(self): return self.coefficients[:,1]
+    g_vec = property(__getG_vec)
+
+    def __getS_h(self): return _descriptorValue(self.coefficients[0,0])
+    s_h = property(__getS_h)
+
+    def __getB_h(self): return _descriptorValue(self.coefficients[1,0])
+    b_h = property(__getB_h)
+
+    def __getE_h(self): return _descriptorValue(self.coefficients[2,0])
+    e_h = property(__getE_h)
+
+    def __getL_h(self): return _descriptorValue(self.coefficients[3,0])
+    l_h = property(__getL_h)
+
+    def __getA_h(self): return _descriptorValue(self.coefficients[4,0])
+    a_h = property(__getA_h)
+
+    def __getC_h(self): return _descriptorValue(self.intercepts[0])
+    c_h = property(__getC_h)
+
+    def __getS_g(self): return _descriptorValue(self.coefficients[0,1])
+    s_g = property(__getS_g)
+
+    def __getB_g(self): return _descriptorValue(self.coefficients[1,1])
+    b_g = property(__getB_g)
+
+    def __getE_g(self): return _descriptorValue(self.coefficients[2,1])
+    e_g = property(__getE_g)
+
+    def __getL_g(self): return _descriptorValue(self.coefficients[3,1])
+    l_g = property(__getL_g)
+
+    def __getA_g(self): return _descriptorValue(self.coefficients[4,1])
+    a_g = property(__getA_g)
+
+    def __getC_g(self): return _descriptorValue(self.intercepts[1])
+    c_g = property(__getC_g)
+
     def getHAbsCorrection(self):
         """
         If solvation is on, this will give the log10 of the ratio of the intrinsic rate
@@ -183,30 +307,71 @@ class SolventData():
         """
         return math.exp(self.A + (self.B / T) + (self.C*math.log(T)) + (self.D * (T**self.E)))
                     
-class SolvationCorrection():
+class SolvationCorrection(object):
     """
     Stores corrections for enthalpy, entropy, and Gibbs free energy when a species is solvated.
     Enthalpy and Gibbs free energy is in J/mol; entropy is in J/mol/K
     """
+    __slots__ = ('enthalpy', 'entropy', 'gibbs')
+
     def __init__(self, enthalpy=None, gibbs=None, entropy=None):
         self.enthalpy = enthalpy
         self.entropy = entropy
         self.gibbs = gibbs
+
+    def __reduce__(self):
+        """
+        A helper function used when pickling a SolvationCorrection object.
+        """
+        return (SolvationCorrection, (self.enthalpy, self.gibbs, self.entropy))
             
-class SoluteData():
+class SoluteData(object):
     """
     Stores Abraham parameters to characterize a solute
+
+    The S, B, E, L and A descriptors are stored together in the vector `vec`,
+    which is what the solvation corrections are computed from.
     """
+    __slots__ = ('vec', 'V', 'comment')
+
     def __init__(self, S=None, B=None, E=None, L=None, A=None, V=None, comment=""):
-        self.S = S
-        self.B = B
-        self.E = E
-        self.L = L
-        self.A = A
+        self.vec = _descriptorVector(S, B, E, L, A)
         self.V = V
         self.comment = comment
+    def __reduce__(self):
+        """
+        A helper function used when pickling a SoluteData object.
+        """
+        return (SoluteData, (self.S, self.B, self.E, self.L, self.A, self.V, self.comment))
     def __repr__(self):
         return "SoluteData(S={0},B={1},E={2},L={3},A={4},comment={5!r})".format(self.S, self.B, self.E, self.L, self.A, self.comment)
+
+    def __getS(self): return _descriptorValue(self.vec[0])
+    def __setS(self, value): self.vec[0] = numpy.nan if value is None else value
+    S = property(__getS, __setS)
+
+    def __getB(self): return _descriptorValue(self.vec[1])
+    def __setB(self, value): self.vec[1] = numpy.nan if value is None else value
+    B = property(__getB, __setB)
+
+    def __getE(self): return _descriptorValue(self.vec[2])
+    def __setE(self, value): self.vec[2] = numpy.nan if value is None else value
+    E = property(__getE, __setE)
+
+    def __getL(self): return _descriptorValue(self.vec[3])
+    def __setL(self, value): self.vec[3] = numpy.nan if value is None else value
+    L = property(__getL, __setL)
+
+    def __getA(self): return _descriptorValue(self.vec[4])
+    def __setA(self, value): self.vec[4] = numpy.nan if value is None else value
+    A = property(__getA, __setA)
+
+    def copy(self):
+        """
+        Return a copy of the solute data. This is much cheaper than
+        :func:`copy.deepcopy`.
+        """
+        return SoluteData(self.S, self.B, self.E, self.L, self.A, self.V, self.comment)
     
     def getStokesDiffusivity(self, T, solventViscosity):
         """
@@ -232,29 +397,27 @@ class SoluteData():
         the contibutions in this function are in cm3/mol, and the division by 100 is done at the very end.
         """
         molecule = species.molecule[0] # any will do, use the first.
-        Vtot = 0
-
-        for atom in molecule.atoms:
-            thisV = 0.0
-            if atom.isCarbon():
-                thisV = 16.35
-            elif (atom.element.number == 7): # nitrogen, do this way if we don't have an isElement method
-                thisV = 14.39
-            elif atom.isOxygen():
-                thisV = 12.43
-            elif atom.isHydrogen():
-                thisV = 8.71
-            elif (atom.element.number == 16):
-                thisV = 22.91
-            else:
-                raise Exception()
-            Vtot = Vtot + thisV
 
-            for bond in molecule.getBonds(atom):
-                # divide contribution in half since all bonds would be counted twice this way
-                Vtot = Vtot - 6.56/2
+        # The volume is stored on the species along with the molecule it was
+        # computed from, so it is recomputed if that molecule is replaced
+        cached = species.props.get('mcGowanVolume')
+        if cached is not None and cached[0] is molecule:
+            self.V = cached[1]
+            return
+
+        atoms = molecule.atoms
+
+        numbers = numpy.fromiter((atom.element.number for atom in atoms), dtype=numpy.intp, count=len(atoms))
+        volumes = _mcGowanVolumes[numbers]
+        if numpy.isnan(volumes).any():
+            raise Exception('No McGowan volume available for some atoms in {0!r}'.format(molecule))
 
-        self.V= Vtot / 100; # division by 100 to get units correct.
+        # each bond appears in the edge dict of both of its atoms
+        numBonds = sum([len(atom.bonds) for atom in atoms]) / 2
+        Vtot = volumes.sum() - 6.56 * numBonds
+
+        self.V = Vtot / 100 # division by 100 to get units correct.
+        species.props['mcGowanVolume'] = (molecule, self.V)
 
 ################################################################################
 
@@ -332,6 +495,8 @@ class SoluteLibrary(Database):
     """
     def __init__(self, label='', name='', shortDesc='', longDesc=''):
         Database.__init__(self, label=label, name=name, shortDesc=shortDesc, longDesc=longDesc)
+        # Entries grouped by packed formula key; built on demand
+        self._entriesByFingerprint = None
 
     def loadEntry(self,
                   index,
@@ -353,6 +518,7 @@ class SoluteLibrary(Database):
                 logging.error("Can't understand '{0}' in solute library '{1}'".format(molecule,self.name))
                 raise
 
+        self._entriesByFingerprint = None
         self.entries[label] = Entry(
             index = index,
             label = label,
@@ -368,8 +534,24 @@ class SoluteLibrary(Database):
         """
         Load the solute library from the given path
         """
+        self._entriesByFingerprint = None
         Database.load(self, path, local_context={'SoluteData': SoluteData}, global_context={})
 
+    def getEntriesByFingerprint(self, fingerprint):
+        """
+        Return the list of entries whose molecules have the given
+        `fingerprint`, as computed by :func:`getFormulaKey`, in the order they
+        appear in the library. Only these entries can be isomorphic to a
+        molecule with that fingerprint.
+        """
+        if self._entriesByFingerprint is None:
+            self._entriesByFingerprint = {}
+            for entry in self.entries.values():
+                if entry.item is None: continue
+                key = getFormulaKey(entry.item.molecule[0])
+                self._entriesByFingerprint.setdefault(key, []).append(entry)
+        return self._entriesByFingerprint.get(fingerprint, [])
+
     def saveEntry(self, f, entry):
         """
         Write the given `entry` in the solute database to the file object `f`.
@@ -399,6 +581,18 @@ class SoluteGroups(Database):
 
     def __init__(self, label='', name='', shortDesc='', longDesc=''):
         Database.__init__(self, label=label, name=name, shortDesc=shortDesc, longDesc=longDesc)
+        # The (data, label) pair found for each node, keyed by node label
+        self._nodeData = {}
+        # The number of bonds on the '*' atom of each node, keyed by node label
+        self._centerDegree = {}
+
+    def load(self, path, local_context=None, global_context=None):
+        """
+        Load the solute groups from the given path
+        """
+        self._nodeData = {}
+        self._centerDegree = {}
+        return Database.load(self, path, local_context, global_context)
 
     def loadEntry(self,
                   index,
@@ -414,6 +608,8 @@ class SoluteGroups(Database):
             item = makeLogicNode(group)
         else:
             item = Group().fromAdjacencyList(group)
+        self._nodeData = {}
+        self._centerDegree = {}
         self.entries[label] = Entry(
             index = index,
             label = label,
@@ -431,6 +627,58 @@ class SoluteGroups(Database):
         """
         return saveEntry(f, entry)
 
+    def matchNodeToStructure(self, node, structure, atoms, strict=False):
+        """
+        Return :data:`True` if the `structure` centered at `atoms` matches the
+        structure at `node` in the dictionary.
+
+        The '*' atom of the structure must have at least as many bonds as the
+        '*' atom of the group for the subgraph isomorphism to succeed, so nodes
+        failing this cheap check are rejected before the full comparison in
+        :meth:`Database.matchNodeToStructure`.
+        """
+        if isinstance(node, str): node = self.entries[node]
+        try:
+            degree = self._centerDegree[node.label]
+        except KeyError:
+            degree = 0
+            if isinstance(node.item, Group):
+                center = node.item.getLabeledAtoms().get('*')
+                if center is not None and not isinstance(center, list):
+                    degree = len(center.bonds)
+            self._centerDegree[node.label] = degree
+        atom = atoms.get('*')
+        if atom is not None and len(atom.bonds) < degree:
+            return False
+        return Database.matchNodeToStructure(self, node, structure, atoms, strict)
+
+    def getNodeData(self, node):
+        """
+        Return the solute data to use for the tree node `node`, along with the
+        label of the entry it came from. Nodes without data fall back to their
+        nearest ancestor that has some, and string data are followed to the
+        entry they refer to. The result is cached for each node.
+        """
+        if node.label in self._nodeData:
+            return self._nodeData[node.label]
+
+        # It's possible (and allowed) that items in the tree may not be in the
+        # library, in which case we need to fall up the tree until we find an
+        # ancestor that has an entry in the library
+        entry = node
+        while entry is not None and entry.data is None:
+            entry = entry.parent
+        if entry is None:
+            raise KeyError('Node has no parent with data in database.')
+        data = entry.data
+        comment = entry.label
+        while isinstance(data, basestring):
+            entry = self.entries[data]
+            data, comment = entry.data, entry.label
+
+        self._nodeData[node.label] = (data, comment)
+        return data, comment
+
     def generateOldLibraryEntry(self, data):
         """
         Return a list of values used to save entries to the old-style RMG
@@ -463,6 +711,8 @@ class SolvationDatabase(object):
             'SolventData': SolventData
         }
         self.global_context = {}
+        # The most recent group additivity estimates, keyed by the adjacency list of the molecule
+        self._soluteCache = OrderedDict()
 
     def __reduce__(self):
         """
@@ -480,19 +730,116 @@ class SolvationDatabase(object):
         """
         self.libraries = d['libraries']
         self.groups = d['groups']
+        self._soluteCache = OrderedDict()
 
-    def load(self, path, libraries=None, depository=True):
+    def load(self, path, libraries=None, depository=True, cachePath=None):
         """
         Load the solvation database from the given `path` on disk, where `path`
         points to the top-level folder of the solvation database.
         
         Load the solvent and solute libraries, then the solute groups.
+
+        If a `cachePath` is given, the loaded database is also pickled to that
+        file, which is used instead of the source files on later loads as long
+        as neither the source files nor the code that reads them have been
+        modified since.
         """
+        if cachePath is not None:
+            cacheKey = self.__getCacheKey(path)
+            if self.__loadCache(cachePath, cacheKey):
+                return
         
         self.libraries['solvent'].load(os.path.join(path,'libraries','solvent.py'))
         self.libraries['solute'].load(os.path.join(path,'libraries','solute.py'))
          
         self.loadGroups(os.path.join(path, 'groups'))
+
+        if cachePath is not None:
+            self.__saveCache(cachePath, cacheKey)
+
+    def __getCacheKey(self, path):
+        """
+        Return the key identifying a cache of the solvation database at `path`:
+        the RMG-Py version, and the modification time of each of the source
+        files and of the modules defining the cached classes.
+        """
+        files = [
+            os.path.join(path, 'libraries', 'solvent.py'),
+            os.path.join(path, 'libraries', 'solute.py'),
+            os.path.join(path, 'groups', 'abraham.py'),
+            os.path.join(path, 'groups', 'nonacentered.py'),
+            os.path.join(path, 'groups', 'radical.py'),
+            os.path.abspath(__file__),
+            os.path.abspath(sys.modules[Database.__module__].__file__),
+        ]
+        return (__version__, [(f, os.path.getmtime(f)) for f in files])
+
+    def __loadCache(self, cachePath, cacheKey):
+        """
+        Load the libraries and groups from the pickled cache at `cachePath`.
+        Returns ``True`` if successful, or ``False`` if the cache does not
+        exist, cannot be read, was made from different files than described
+        by `cacheKey`, or does not contain the expected objects.
+        """
+        if not os.path.exists(cachePath):
+            return False
+        try:
+            f = open(cachePath, 'rb')
+            try:
+                key, libraries, groups = cPickle.load(f)
+            finally:
+                f.close()
+        except Exception, e:
+            logging.debug('Unable to read solvation database cache {0!r}: {1}'.format(cachePath, e))
+            return False
+        if key != cacheKey:
+            return False
+        if not self.__isValidCache(libraries, groups):
+            logging.debug('Ignoring solvation database cache {0!r} with unexpected contents.'.format(cachePath))
+            return False
+        logging.info('Loading solvation database from cache {0}...'.format(cachePath))
+        self.libraries = libraries
+        self.groups = groups
+        self._soluteCache = OrderedDict()
+        return True
+
+    def __isValidCache(self, libraries, groups):
+        """
+        Return ``True`` if the unpickled `libraries` and `groups` are of the
+        same classes and have at least the same attributes as newly created
+        ones, or ``False`` otherwise.
+        """
+        if not isinstance(libraries, dict) or not isinstance(groups, dict):
+            return False
+        expected = [(libraries.get('solvent'), SolventLibrary()), (libraries.get('solute'), SoluteLibrary())]
+        for label in ['abraham', 'nonacentered', 'radical']:
+            expected.append((groups.get(label), SoluteGroups()))
+        for loaded, new in expected:
+            if loaded.__class__ is not new.__class__:
+                return False
+            for attribute in vars(new):
+                if attribute not in vars(loaded):
+                    return False
+        return True
+
+    def __saveCache(self, cachePath, cacheKey):
+        """
+        Pickle the libraries and groups to the cache at `cachePath`, along
+        with the `cacheKey` describing the source files. Failure to write the
+        cache (e.g. for a read-only database) is not an error.
+        """
+        tempPath = '{0}.{1:d}.tmp'.format(cachePath, os.getpid())
+        try:
+            f = open(tempPath, 'wb')
+            try:
+                cPickle.dump((cacheKey, self.libraries, self.groups), f, cPickle.HIGHEST_PROTOCOL)
+            finally:
+                f.close()
+            os.rename(tempPath, cachePath)
+        except Exception, e:
+            logging.debug('Unable to write solvation database cache {0!r}: {1}'.format(cachePath, e))
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
         
     def getSolventData(self, solvent_name):
         try:
@@ -517,6 +864,7 @@ class SolvationDatabase(object):
         ('nonacentered'), and radical corrections ('radical')
         """
         logging.info('Loading Platts additivity group database from {0}...'.format(path))
+        self._soluteCache = OrderedDict()
         self.groups = {}
         self.groups['abraham']   =   SoluteGroups(label='abraham').load(os.path.join(path, 'abraham.py'  ), self.local_context, self.global_context)
         self.groups['nonacentered']  =  SoluteGroups(label='nonacentered').load(os.path.join(path, 'nonacentered.py' ), self.local_context, self.global_context)
@@ -661,9 +1009,11 @@ class SolvationDatabase(object):
         ``None`` is returned. If no corresponding library is found, a
         :class:`DatabaseError` is raised.
         """
-        for label, entry in library.entries.iteritems():
-            if species.isIsomorphic(entry.item) and entry.data is not None:
-                return (deepcopy(entry.data), library, entry)
+        # Resonance isomers share a fingerprint, so any molecule will do
+        fingerprint = getFormulaKey(species.molecule[0])
+        for entry in library.getEntriesByFingerprint(fingerprint):
+            if entry.data is not None and species.isIsomorphic(entry.item):
+                return (entry.data.copy(), library, entry)
         return None
 
     def getSoluteDataFromGroups(self, species):
@@ -676,26 +1026,19 @@ class SolvationDatabase(object):
         It averages (linearly) over the desciptors for each Molecule (resonance isomer)
         in the Species.
         """       
-        soluteData = SoluteData(0.0,0.0,0.0,0.0,0.0)
-        count = 0
+        descriptors = numpy.empty((len(species.molecule), 5))
         comments = []
-        for molecule in species.molecule:
+        # The resonance isomers are estimated one after another: the group
+        # matching is pure Python/Cython code that holds the GIL, so threads
+        # would not overlap any work, and parallelism in RMG is per species
+        for i, molecule in enumerate(species.molecule):
             molecule.clearLabeledAtoms()
-            molecule.updateAtomTypes()
             sdata = self.estimateSoluteViaGroupAdditivity(molecule)
-            soluteData.S += sdata.S
-            soluteData.B += sdata.B
-            soluteData.E += sdata.E
-            soluteData.L += sdata.L
-            soluteData.A += sdata.A
-            count += 1
+            descriptors[i, :] = sdata.vec
             comments.append(sdata.comment)
         
-        soluteData.S /= count
-        soluteData.B /= count
-        soluteData.E /= count
-        soluteData.L /= count
-        soluteData.A /= count
+        soluteData = SoluteData()
+        soluteData.vec = descriptors.mean(axis=0)
         
         # Print groups that are used for debugging purposes
         soluteData.comment = "Average of {0}".format(" and ".join(comments))
@@ -768,12 +1111,12 @@ class SolvationDatabase(object):
         # Update Abraham 'A' H-bonding parameter for unsaturated struct
         for atom in saturatedStruct.atoms:
             # Iterate over heavy (non-hydrogen) atoms
-            if atom.isNonHydrogen() and atom.radicalElectrons > 0:
-                for electron in range(1, atom.radicalElectrons):
-                    # Get solute data for radical group    
-                    try:
-                        self.__addGroupSoluteData(soluteData, self.groups['radical'], saturatedStruct, {'*':atom})
-                    except KeyError: pass
+            if atom.isNonHydrogen() and atom.radicalElectrons > 1:
+                # Get solute data for radical group once, and count it for
+                # every radical electron on the atom after the first
+                try:
+                    self.__addGroupSoluteData(soluteData, self.groups['radical'], saturatedStruct, {'*':atom}, atom.radicalElectrons - 1)
+                except KeyError: pass
       
         return soluteData
 
@@ -789,6 +1132,22 @@ class SolvationDatabase(object):
         # will probably not visit the right atoms, and so will get the thermo wrong
         molecule.sortAtoms()
 
+        # The estimate depends only on the structure, so reuse any previous
+        # result for an identical (sorted) molecule
+        key = molecule.toAdjacencyList(removeH=False)
+        try:
+            soluteData = self._soluteCache.pop(key)
+        except KeyError:
+            pass
+        else:
+            # reinsert as the most recently used
+            self._soluteCache[key] = soluteData
+            return soluteData.copy()
+
+        # The group trees are matched using atom types, so make sure they are
+        # up to date (only needed when the result is not already cached)
+        molecule.updateAtomTypes()
+
         # Create the SoluteData object with the intercepts from the Platts groups
         soluteData = SoluteData(
             S = 0.277,
@@ -800,47 +1159,82 @@ class SolvationDatabase(object):
         
         addedToRadicals = {} # Dictionary of key = atom, value = dictionary of {H atom: bond}
         addedToPairs = {} # Dictionary of key = atom, value = # lone pairs changed
-        saturatedStruct = molecule.copy(deep=True)
+        saturatedStruct = molecule
 
         # Convert lone pairs to radicals, then saturate with H.
        
         # Change lone pairs to radicals based on valency
+        # (this works on a copy of the molecule)
         if sum([atom.lonePairs for atom in saturatedStruct.atoms]) > 0: # molecule contains lone pairs
             saturatedStruct, addedToPairs = self.transformLonePairs(saturatedStruct)
 
-        # Now saturate radicals with H
-        if sum([atom.radicalElectrons for atom in saturatedStruct.atoms]) > 0: # radical species
-            addedToRadicals = saturatedStruct.saturate()
-
-        # Saturated structure should now have no unpaired electrons, and only "expected" lone pairs
-        # based on the valency
-        for atom in saturatedStruct.atoms:
-            # Iterate over heavy (non-hydrogen) atoms
-            if atom.isNonHydrogen():
-                # Get initial solute data from main group database. Every atom must
-                # be found in the main abraham database
-                try:
-                    self.__addGroupSoluteData(soluteData, self.groups['abraham'], saturatedStruct, {'*':atom})
-                except KeyError:
-                    logging.error("Couldn't find in main abraham database:")
-                    logging.error(saturatedStruct)
-                    logging.error(saturatedStruct.toAdjacencyList())
-                    raise
-                # Get solute data for non-atom centered groups (being found in this group
-                # database is optional)    
-                try:
-                    self.__addGroupSoluteData(soluteData, self.groups['nonacentered'], saturatedStruct, {'*':atom})
-                except KeyError: pass
-        
-        soluteData = self.removeHBonding(saturatedStruct, addedToRadicals, addedToPairs, soluteData)
+        # Remember the state of the structure, since it may still be the
+        # original molecule and saturating it with H changes it in place
+        atomStates = [(atom, atom.atomType, atom.radicalElectrons, atom.lonePairs, atom.connectivity1,
+                       atom.connectivity2, atom.connectivity3, atom.sortingLabel) for atom in saturatedStruct.atoms]
+        multiplicity = saturatedStruct.multiplicity
 
+        try:
+            # Now saturate radicals with H
+            if sum([atom.radicalElectrons for atom in saturatedStruct.atoms]) > 0: # radical species
+                addedToRadicals = saturatedStruct.saturate()
+
+            # Saturated structure should now have no unpaired electrons, and only "expected" lone pairs
+            # based on the valency
+            for atom in saturatedStruct.atoms:
+                # Iterate over heavy (non-hydrogen) atoms
+                if atom.isNonHydrogen():
+                    # Get initial solute data from main group database. Every atom must
+                    # be found in the main abraham database
+                    try:
+                        self.__addGroupSoluteData(soluteData, self.groups['abraham'], saturatedStruct, {'*':atom})
+                    except KeyError:
+                        logging.error("Couldn't find in main abraham database:")
+                        logging.error(saturatedStruct)
+                        logging.error(saturatedStruct.toAdjacencyList())
+                        raise
+                    # Get solute data for non-atom centered groups (being found in this group
+                    # database is optional)    
+                    try:
+                        self.__addGroupSoluteData(soluteData, self.groups['nonacentered'], saturatedStruct, {'*':atom})
+                    except KeyError: pass
+            
+            soluteData = self.removeHBonding(saturatedStruct, addedToRadicals, addedToPairs, soluteData)
+        finally:
+            # Also runs if saturating or matching failed partway through
+            self.__restoreStructure(saturatedStruct, atomStates, multiplicity)
+
+        if len(self._soluteCache) >= _soluteCacheSize:
+            self._soluteCache.popitem(last=False)
+        self._soluteCache[key] = soluteData.copy()
         return soluteData
 
-    def __addGroupSoluteData(self, soluteData, database, molecule, atom):
+    def __restoreStructure(self, molecule, atomStates, multiplicity):
+        """
+        Undo the saturation of `molecule` with hydrogen atoms, removing every
+        atom (and its bonds) that is not recorded in `atomStates`, and restore
+        the atom order and per-atom state recorded there.
+        """
+        atoms = [state[0] for state in atomStates]
+        recorded = set(atoms)
+        for atom in [atom for atom in molecule.atoms if atom not in recorded]:
+            molecule.removeAtom(atom)
+        molecule.atoms = atoms
+        for atom, atomType, radicalElectrons, lonePairs, connectivity1, connectivity2, connectivity3, sortingLabel in atomStates:
+            atom.atomType = atomType
+            atom.radicalElectrons = radicalElectrons
+            atom.lonePairs = lonePairs
+            atom.connectivity1 = connectivity1
+            atom.connectivity2 = connectivity2
+            atom.connectivity3 = connectivity3
+            atom.sortingLabel = sortingLabel
+        molecule.multiplicity = multiplicity
+
+    def __addGroupSoluteData(self, soluteData, database, molecule, atom, count=1):
         """
         Determine the Platts group additivity solute data for the atom `atom`
         in the structure `structure`, and add it to the existing solute data
-        `soluteData`.
+        `soluteData`. The group contribution is added `count` times.
         """
 
         node0 = database.descendTree(molecule, atom, None)
@@ -848,23 +1242,8 @@ class SolvationDatabase(object):
         if node0 is None:
             raise KeyError('Node not found in database.')
 
-        # It's possible (and allowed) that items in the tree may not be in the
-        # library, in which case we need to fall up the tree until we find an
-        # ancestor that has an entry in the library
         node = node0
-        
-        while node is not None and node.data is None:
-            node = node.parent
-        if node is None:
-            raise KeyError('Node has no parent with data in database.')
-        data = node.data
-        comment = node.label
-        while isinstance(data, basestring) and data is not None:
-            for entry in database.entries.values():
-                if entry.label == data:
-                    data = entry.data
-                    comment = entry.label
-                    break
+        data, comment = database.getNodeData(node)
         comment = '{0}({1})'.format(database.label, comment)
 
         # This code prints the hierarchy of the found node; useful for debugging
@@ -875,12 +1254,8 @@ class SolvationDatabase(object):
         #print result[4:]
         
         # Add solute data for each atom to the overall solute data for the molecule.
-        soluteData.S += data.S
-        soluteData.B += data.B
-        soluteData.E += data.E
-        soluteData.L += data.L
-        soluteData.A += data.A
-        soluteData.comment += comment + "+"
+        soluteData.vec += count * data.vec
+        soluteData.comment += (comment + "+") * count
         
         return soluteData
 
@@ -889,19 +1264,13 @@ class SolvationDatabase(object):
         """
         Returns the enthalpy of solvation, at 298K, in J/mol
         """
-        # Use Mintz parameters for solvents. Multiply by 1000 to go from kJ->J to maintain consistency
-        delH = 1000*((soluteData.S*solventData.s_h)+(soluteData.B*solventData.b_h)+(soluteData.E*solventData.e_h)+(soluteData.L*solventData.l_h)+(soluteData.A*solventData.a_h)+solventData.c_h)  
-        return delH
+        return self.__calcSolvation(soluteData.vec, solventData, gibbs=False)[0]
     
     def calcG(self, soluteData, solventData):
         """
         Returns the Gibbs free energy of solvation, at 298K, in J/mol
         """
-        # Use Abraham parameters for solvents to get log K
-        logK = (soluteData.S*solventData.s_g)+(soluteData.B*solventData.b_g)+(soluteData.E*solventData.e_g)+(soluteData.L*solventData.l_g)+(soluteData.A*solventData.a_g)+solventData.c_g
-        # Convert to delG with units of J/mol
-        delG = -8.314*298*2.303*logK
-        return delG
+        return self.__calcSolvation(soluteData.vec, solventData, enthalpy=False)[1]
         
     def calcS(self, delG, delH):
         """
@@ -916,11 +1285,43 @@ class SolvationDatabase(object):
         and Gibbs free energy of solvation at 298 K. Returns a SolvationCorrection
         object
         """
-        correction = SolvationCorrection(0.0, 0.0, 0.0)
-        correction.enthalpy = self.calcH(soluteData, solventData)
-        correction.gibbs = self.calcG(soluteData, solventData)  
-        correction.entropy = self.calcS(correction.gibbs, correction.enthalpy) 
-        return correction
+        delH, delG, delS = self.__calcSolvation(soluteData.vec, solventData)
+        return SolvationCorrection(delH, delG, delS)
+
+    def getSolvationCorrections(self, soluteDataList, solventData):
+        """
+        Given a list of soluteData objects and a single solventData object,
+        calculates the enthalpy, Gibbs free energy, and entropy of solvation at
+        298 K for all of the solutes at once. Returns three numpy arrays
+        (enthalpy and Gibbs free energy in J/mol, entropy in J/mol/K) in the
+        same order as `soluteDataList`, which are empty if the list is empty.
+        """
+        if soluteDataList:
+            descriptors = numpy.vstack([soluteData.vec for soluteData in soluteDataList])
+        else:
+            descriptors = numpy.empty((0, 5))
+        return self.__calcSolvation(descriptors, solventData)
+
+    def __calcSolvation(self, descriptors, solventData, enthalpy=True, gibbs=True):
+        """
+        Return the enthalpy and Gibbs free energy of solvation in J/mol and the
+        entropy of solvation in J/mol/K, at 298 K, for the solute descriptor
+        vector `descriptors` in the solvent `solventData`. If `descriptors` is
+        a matrix with one descriptor vector per row, arrays are returned
+        instead. The solvent only needs the Mintz parameters if `enthalpy` is
+        requested and the Abraham parameters if `gibbs` is requested; any
+        quantity that cannot be computed is returned as NaN.
+        """
+        if enthalpy and not solventData.hasMintz:
+            raise ValueError('The solvent is missing Mintz parameters for the enthalpy of solvation.')
+        if gibbs and not solventData.hasAbraham:
+            raise ValueError('The solvent is missing Abraham parameters for the Gibbs free energy of solvation.')
+        if numpy.isnan(descriptors).any():
+            raise ValueError('The solute is missing Abraham descriptors.')
+        # Evaluate the Mintz (enthalpy) and Abraham (log K) relationships together
+        delH, delG = ((numpy.dot(descriptors, solventData.coefficients) + solventData.intercepts) * _solvationUnits).T
+        delS = (delH-delG)/298
+        return delH, delG, delS
 
     def checkSolventinInitialSpecies(self,rmg,solventStructure):
         """
@@ -2,17 +2,116 @@
 # -*- coding: utf-8 -*-
 
 import os
+import shutil
+import tempfile
+import cPickle
 from unittest import TestCase, TestLoader, TextTestRunner
 from external.wip import work_in_progress
 
+import rmgpy.data.solvation
 from rmgpy import settings
 from rmgpy.molecule import Molecule
+from rmgpy.molecule.atomtype import AtomTypeError
 from rmgpy.rmg.main import Species
-from rmgpy.data.solvation import DatabaseError, SoluteData, SolvationDatabase, SolventLibrary
+from rmgpy.data.base import Database, LogicNode
+from rmgpy.data.solvation import DatabaseError, SoluteData, SoluteGroups, SolvationDatabase, SolventData, SolventLibrary, getFormulaKey
 from rmgpy.rmg.main import RMG
 
 ###################################################
 
+testGroups = '''
+entry(
+    index = 0,
+    label = "R",
+    group = "OR{Cs, Od}",
+    solute = None,
+)
+
+entry(
+    index = 1,
+    label = "Cs",
+    group = 
+"""
+1 * Cs u0 {2,S} {3,S} {4,S} {5,S}
+2   R  u0 {1,S}
+3   R  u0 {1,S}
+4   R  u0 {1,S}
+5   R  u0 {1,S}
+""",
+    solute = SoluteData(S=1.0, B=0.0, E=0.0, L=0.0, A=0.0),
+)
+
+entry(
+    index = 2,
+    label = "CsO",
+    group = 
+"""
+1 * Cs u0 {2,S} {3,S} {4,S} {5,S}
+2   Os u0 {1,S}
+3   R  u0 {1,S}
+4   R  u0 {1,S}
+5   R  u0 {1,S}
+""",
+    solute = SoluteData(S=2.0, B=0.0, E=0.0, L=0.0, A=0.0),
+)
+
+entry(
+    index = 3,
+    label = "Od",
+    group = 
+"""
+1 * Od  u0 {2,D}
+2   R!H u0 {1,D}
+""",
+    solute = SoluteData(S=3.0, B=0.0, E=0.0, L=0.0, A=0.0),
+)
+
+tree(
+"""
+L1: R
+    L2: Cs
+        L3: CsO
+    L2: Od
+"""
+)
+'''
+
+def descendTreeWithoutPrefilter(groups, structure, atoms):
+    """
+    Descend the tree of `groups` using only the generic node matching of
+    :class:`Database`.
+    """
+    groups.matchNodeToStructure = lambda node, structure, atoms, strict=False: Database.matchNodeToStructure(groups, node, structure, atoms, strict)
+    try:
+        return groups.descendTree(structure, atoms)
+    finally:
+        del groups.matchNodeToStructure
+
+class UnsaturableMolecule(Molecule):
+    """
+    A molecule whose atom types cannot be assigned once it has been saturated
+    with hydrogen, so that :meth:`Molecule.saturate` fails partway through.
+    """
+    def updateAtomTypes(self, logSpecies=True):
+        if self.getRadicalCount() == 0:
+            raise AtomTypeError('Unable to determine atom types of the saturated structure.')
+        Molecule.updateAtomTypes(self, logSpecies)
+
+def loadSolvationDatabase(path, cachePath):
+    """
+    Load the solvation database at `path` using the cache at `cachePath`, and
+    return whether the group files were parsed and whether the groups work.
+    """
+    database = SolvationDatabase()
+    parsed = []
+    def loadGroups(groupsPath):
+        parsed.append(groupsPath)
+        SolvationDatabase.loadGroups(database, groupsPath)
+    database.loadGroups = loadGroups
+    database.load(path, cachePath=cachePath)
+    species = Species(molecule=[Molecule(SMILES='CCO')])
+    return bool(parsed), database.getSoluteDataFromGroups(species) is not None
+
 class TestSoluteDatabase(TestCase):
     
     def setUp(self):
@@ -22,6 +121,49 @@ class TestSoluteDatabase(TestCase):
     def runTest(self):
         pass
     
+    def testCache(self):
+        "Test that the solvation database can be loaded from a cache, which is ignored when out of date"
+        path = tempfile.mkdtemp()
+        try:
+            databasePath = os.path.join(path, 'solvation')
+            shutil.copytree(os.path.join(settings['database.directory'], 'solvation'), databasePath)
+            cachePath = os.path.join(path, 'solvation.pkl')
+            species = Species(molecule=[Molecule(SMILES='CCO')])
+
+            # Without a cache path, no cache is written
+            SolvationDatabase().load(databasePath)
+            self.assertEqual(os.listdir(path), ['solvation'])
+
+            self.assertEqual(loadSolvationDatabase(databasePath, cachePath), (True, True))
+            self.assertTrue(os.path.exists(cachePath))
+
+            # The cache is used while nothing has changed
+            database = SolvationDatabase()
+            database.loadGroups = None # the groups must not be parsed
+            database.load(databasePath, cachePath=cachePath)
+            self.assertEqual(database.libraries['solute'].entries.keys(), self.database.libraries['solute'].entries.keys())
+            self.assertEqual(database.getSolventData('water').s_h, 2.836)
+            self.assertEqual(database.getSoluteDataFromGroups(species).S, self.database.getSoluteDataFromGroups(species).S)
+
+            # A cache made from an older version of a source file is ignored and replaced
+            source = os.path.join(databasePath, 'groups', 'radical.py')
+            mtime = os.path.getmtime(source) + 10
+            os.utime(source, (mtime, mtime))
+            self.assertEqual(loadSolvationDatabase(databasePath, cachePath), (True, True))
+            self.assertEqual(loadSolvationDatabase(databasePath, cachePath), (False, True))
+
+            # A cache without all of the expected attributes is ignored
+            f = open(cachePath, 'rb')
+            key, libraries, groups = cPickle.load(f)
+            f.close()
+            del groups['abraham']._nodeData
+            f = open(cachePath, 'wb')
+            cPickle.dump((key, libraries, groups), f)
+            f.close()
+            self.assertEqual(loadSolvationDatabase(databasePath, cachePath), (True, True))
+        finally:
+            shutil.rmtree(path)
+
     def testSoluteLibrary(self):
         "Test we can obtain solute parameters from a library"
         species = Species(molecule=[Molecule(SMILES='COC=O')]) #methyl formate - we know this is in the solute library
@@ -36,6 +178,13 @@ class TestSoluteDatabase(TestCase):
         self.assertEqual(S, 0.68)
         self.assertTrue(soluteData.V is not None)
      
+    def testFormulaKey(self):
+        "Test that the packed formula key distinguishes formulas but not isomers"
+        self.assertEqual(getFormulaKey(Molecule(SMILES='CCO')), getFormulaKey(Molecule(SMILES='COC')))
+        self.assertNotEqual(getFormulaKey(Molecule(SMILES='CCO')), getFormulaKey(Molecule(SMILES='CCS')))
+        self.assertNotEqual(getFormulaKey(Molecule(SMILES='CCO')), getFormulaKey(Molecule(SMILES='CC=O')))
+        self.assertEqual(getFormulaKey(Molecule(SMILES='C')), 1 + (4 << 8))
+
     def testMcGowan(self):
         "Test we can calculate and set the McGowan volume for species containing H,C,O,N or S"
         self.testCases = [
@@ -51,6 +200,26 @@ class TestSoluteDatabase(TestCase):
             soluteData.setMcGowanVolume(species) # even if it was found in library, recalculate
             self.assertTrue(soluteData.V is not None) # so if it wasn't found in library, we should have calculated it
             self.assertAlmostEqual(soluteData.V, volume) # the volume is what we expect given the atoms and bonds 
+
+        # The volume is cached on the species for its first molecule
+        species = Species(molecule=[Molecule(SMILES='CCS')])
+        soluteData = SoluteData()
+        soluteData.setMcGowanVolume(species)
+        self.assertTrue(species.props['mcGowanVolume'][0] is species.molecule[0])
+        self.assertEqual(species.props['mcGowanVolume'][1], soluteData.V)
+        species.props['mcGowanVolume'] = (species.molecule[0], 1.0)
+        soluteData.setMcGowanVolume(species)
+        self.assertEqual(soluteData.V, 1.0)
+        # including on a copy of the species
+        other = cPickle.loads(cPickle.dumps(species))
+        self.assertTrue(other.props['mcGowanVolume'][0] is other.molecule[0])
+        soluteData.setMcGowanVolume(other)
+        self.assertEqual(soluteData.V, 1.0)
+        # and recalculated when that molecule is replaced
+        species.molecule[0] = Molecule(SMILES='CCO')
+        soluteData.setMcGowanVolume(species)
+        self.assertAlmostEqual(soluteData.V, 0.4491)
+        self.assertTrue(species.props['mcGowanVolume'][0] is species.molecule[0])
             
     
     def testDiffusivity(self):
@@ -63,6 +232,70 @@ class TestSoluteDatabase(TestCase):
         self.assertAlmostEqual((D * 1e9), 1.3, 1)
         # self-diffusivity of water is about 2e-9 m2/s
         
+    def testSoluteDataVector(self):
+        "Test that the solute descriptors are kept in sync with the descriptor vector"
+        soluteData = SoluteData(S=0.1, B=0.2, E=0.3, L=0.4, A=0.5)
+        self.assertEqual(list(soluteData.vec), [0.1, 0.2, 0.3, 0.4, 0.5])
+        soluteData.L += 1.0
+        self.assertAlmostEqual(soluteData.vec[3], 1.4)
+        soluteData.vec[0] = 2.0
+        self.assertEqual(soluteData.S, 2.0)
+        soluteData.S = None
+        self.assertTrue(soluteData.S is None)
+        self.assertTrue(SoluteData().A is None)
+        self.assertTrue(cPickle.loads(cPickle.dumps(SoluteData(S=0.1))).B is None)
+
+    def testMissingParameters(self):
+        "Test that missing solute descriptors or solvent parameters are an error"
+        solventData = self.database.getSolventData('water')
+        soluteData = SoluteData(S=0.1, B=0.2, E=0.3, L=0.4, A=None)
+        self.assertRaises(ValueError, self.database.getSolvationCorrection, soluteData, solventData)
+        self.assertRaises(ValueError, self.database.calcG, soluteData, solventData)
+        soluteData.A = 0.5
+        solventData = SolventData(s_h=1.0, b_h=1.0, e_h=1.0, l_h=1.0, a_h=None, c_h=1.0,
+                                  s_g=1.0, b_g=1.0, e_g=1.0, l_g=1.0, a_g=1.0, c_g=1.0)
+        self.assertRaises(ValueError, self.database.calcH, soluteData, solventData)
+        self.assertRaises(ValueError, self.database.getSolvationCorrection, soluteData, solventData)
+        self.assertAlmostEqual(self.database.calcG(soluteData, solventData), -8.314*298*2.303*2.5)
+
+    def testSoluteDataCopy(self):
+        "Test that copying solute data gives an independent object"
+        soluteData = SoluteData(S=0.1, B=0.2, E=0.3, L=0.4, A=0.5, V=0.6, comment='test')
+        other = soluteData.copy()
+        self.assertEqual(list(other.vec), list(soluteData.vec))
+        self.assertEqual(other.V, 0.6)
+        self.assertEqual(other.comment, 'test')
+        other.S += 1.0
+        self.assertEqual(soluteData.S, 0.1)
+
+    def testPickle(self):
+        "Test that solute and solvent data can be pickled and unpickled"
+        soluteData = SoluteData(S=0.1, B=0.2, E=0.3, L=0.4, A=0.5, V=0.6, comment='test')
+        other = cPickle.loads(cPickle.dumps(soluteData))
+        self.assertEqual(list(other.vec), list(soluteData.vec))
+        self.assertEqual(other.V, soluteData.V)
+        self.assertEqual(other.comment, soluteData.comment)
+        solventData = self.database.getSolventData('water')
+        other = cPickle.loads(cPickle.dumps(solventData))
+        self.assertEqual(other.s_h, solventData.s_h)
+        self.assertEqual(list(other.g_vec), list(solventData.g_vec))
+
+    def testSolventDataVectors(self):
+        "Test that the solvent coefficients cannot get out of step with their vectors"
+        solventData = SolventData(s_h=1.0, b_h=2.0, e_h=3.0, l_h=4.0, a_h=None, c_h=5.0,
+                                  s_g=6.0, b_g=7.0, e_g=8.0, l_g=9.0, a_g=10.0, c_g=None)
+        self.assertEqual(list(solventData.h_vec[:4]), [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(list(solventData.g_vec), [6.0, 7.0, 8.0, 9.0, 10.0])
+        self.assertTrue(solventData.a_h is None)
+        self.assertEqual(solventData.c_h, 5.0)
+        self.assertTrue(solventData.c_g is None)
+        self.assertRaises(AttributeError, setattr, solventData, 's_h', 0.0)
+        self.assertRaises(ValueError, solventData.g_vec.__setitem__, 0, 0.0)
+        self.assertEqual(solventData.s_g, 6.0)
+        self.assertFalse(solventData.hasMintz)
+        self.assertFalse(solventData.hasAbraham)
+        self.assertTrue(self.database.getSolventData('water').hasMintz)
+
     def testSolventLibrary(self):
         "Test we can obtain solvent parameters from a library"
         solventData = self.database.getSolventData('water')
@@ -91,6 +324,72 @@ class TestSoluteDatabase(TestCase):
             self.assertAlmostEqual(soluteData.L, L, places=2)
             self.assertAlmostEqual(soluteData.A, A, places=2)
 
+    def testSoluteGenerationCache(self):
+        "Test that repeated group additivity estimates are reused without being shared"
+        molecule = Molecule(SMILES='C(CO)O')
+        soluteData1 = self.database.estimateSoluteViaGroupAdditivity(molecule)
+        self.assertEqual(len(self.database._soluteCache), 1)
+        # Without the groups the estimate can only come from the cache
+        groups = self.database.groups
+        self.database.groups = {}
+        try:
+            soluteData2 = self.database.estimateSoluteViaGroupAdditivity(Molecule(SMILES='C(CO)O'))
+        finally:
+            self.database.groups = groups
+        self.assertFalse(soluteData1 is soluteData2)
+        self.assertEqual(soluteData1.S, soluteData2.S)
+        self.assertEqual(soluteData1.A, soluteData2.A)
+        self.assertEqual(soluteData1.comment, soluteData2.comment)
+        soluteData2.S += 1.0
+        self.assertEqual(self.database.estimateSoluteViaGroupAdditivity(molecule).S, soluteData1.S)
+
+    def testSoluteGenerationCacheSize(self):
+        "Test that the least recently used group additivity estimate is dropped when the cache is full"
+        cacheSize = rmgpy.data.solvation._soluteCacheSize
+        rmgpy.data.solvation._soluteCacheSize = 2
+        try:
+            molecules = [Molecule(SMILES=smiles) for smiles in ['C(CO)O', 'CCO', 'CCCO']]
+            self.database.estimateSoluteViaGroupAdditivity(molecules[0])
+            self.database.estimateSoluteViaGroupAdditivity(molecules[1])
+            self.database.estimateSoluteViaGroupAdditivity(molecules[0])
+            self.database.estimateSoluteViaGroupAdditivity(molecules[2])
+        finally:
+            rmgpy.data.solvation._soluteCacheSize = cacheSize
+        keys = [molecule.toAdjacencyList(removeH=False) for molecule in molecules]
+        self.assertEqual(self.database._soluteCache.keys(), [keys[0], keys[2]])
+
+    def testGroupMatchingPrefilter(self):
+        "Test that checking the degree of the center atom does not change the nodes found in the group trees"
+        molecules = [Molecule(SMILES=smiles) for smiles in ['C', 'O', 'CCO', 'CC(=O)O', 'C=CC#N', 'CS', 'c1ccccc1O', '[C-]#[O+]']]
+        for label in ['abraham', 'nonacentered', 'radical']:
+            groups = self.database.groups[label]
+            for molecule in molecules:
+                for atom in molecule.atoms:
+                    if atom.isNonHydrogen():
+                        self.assertEqual(groups.descendTree(molecule, {'*': atom}),
+                                         descendTreeWithoutPrefilter(groups, molecule, {'*': atom}))
+
+    def testGroupMatchingPrefilterLogicNode(self):
+        "Test the degree check on a group tree with a logic node at the top and a low-degree center"
+        path = tempfile.mkdtemp()
+        try:
+            f = open(os.path.join(path, 'groups.py'), 'w')
+            f.write(testGroups)
+            f.close()
+            groups = SoluteGroups(label='test').load(os.path.join(path, 'groups.py'), self.database.local_context, self.database.global_context)
+        finally:
+            shutil.rmtree(path)
+        self.assertTrue(isinstance(groups.top[0].item, LogicNode))
+
+        molecule = Molecule(SMILES='CC(=O)O')
+        expected = ['Cs', None, 'Od', None]
+        for atom, label in zip(molecule.atoms[:4], expected):
+            node = groups.descendTree(molecule, {'*': atom})
+            self.assertEqual(node.label if node else None, label)
+            self.assertEqual(node, descendTreeWithoutPrefilter(groups, molecule, {'*': atom}))
+        molecule = Molecule(SMILES='CO')
+        self.assertEqual(groups.descendTree(molecule, {'*': molecule.atoms[0]}).label, 'CsO')
+
     def testLonePairSoluteGeneration(self):
         "Test we can obtain solute parameters via group additivity for a molecule with lone pairs"
         molecule=Molecule().fromAdjacencyList(
@@ -164,6 +463,27 @@ multiplicity 2
         soluteData = self.database.getSoluteDataFromGroups(species)
         self.assertTrue(soluteData is not None)
 
+    def testRadicalGenerationLeavesMoleculeUnchanged(self):
+        "Test that estimating solute parameters for a radical does not modify the molecule"
+        molecule = Molecule(SMILES='C[CH]C')
+        adjlist = molecule.toAdjacencyList()
+        soluteData = self.database.estimateSoluteViaGroupAdditivity(molecule)
+        self.assertTrue(soluteData is not None)
+        self.assertEqual(molecule.toAdjacencyList(), adjlist)
+        self.assertEqual(molecule.multiplicity, 2)
+
+    def testFailedSaturationLeavesMoleculeUnchanged(self):
+        "Test that the molecule is restored even if saturating it with hydrogen fails"
+        molecule = UnsaturableMolecule().fromSMILES('C[CH]C')
+        adjlist = molecule.toAdjacencyList(removeH=False)
+        cacheSize = len(self.database._soluteCache)
+        self.assertRaises(AtomTypeError, self.database.estimateSoluteViaGroupAdditivity, molecule)
+        self.assertEqual(molecule.toAdjacencyList(removeH=False), adjlist)
+        self.assertEqual(len(molecule.atoms), 10)
+        self.assertEqual(molecule.getRadicalCount(), 1)
+        self.assertEqual(molecule.multiplicity, 2)
+        self.assertEqual(len(self.database._soluteCache), cacheSize)
+
     def testCorrectionGeneration(self):
         "Test we can estimate solvation thermochemistry."
         self.testCases = [
@@ -184,6 +504,21 @@ multiplicity 2
             self.assertAlmostEqual(solvationCorrection.enthalpy / 10000., H / 10000., 0, msg="Solvation enthalpy discrepancy ({2:.0f}!={3:.0f}) for {0} in {1}".format(soluteName, solventName, solvationCorrection.enthalpy, H))  #0 decimal place, in 10kJ.
             self.assertAlmostEqual(solvationCorrection.gibbs / 10000., G / 10000., 0, msg="Solvation Gibbs free energy discrepancy ({2:.0f}!={3:.0f}) for {0} in {1}".format(soluteName, solventName, solvationCorrection.gibbs, G))
 
+    def testBatchCorrectionGeneration(self):
+        "Test that batched solvation corrections match the corrections for each solute"
+        solventData = self.database.getSolventData('water')
+        soluteDataList = [self.database.getSoluteData(Species(molecule=[Molecule(SMILES=smiles)]))
+                          for smiles in ['C(C)(=O)O', 'CCCCCCCC', 'C1CCOC1']]
+        delH, delG, delS = self.database.getSolvationCorrections(soluteDataList, solventData)
+        self.assertEqual(len(delH), 3)
+        for i, soluteData in enumerate(soluteDataList):
+            correction = self.database.getSolvationCorrection(soluteData, solventData)
+            self.assertAlmostEqual(delH[i], correction.enthalpy)
+            self.assertAlmostEqual(delG[i], correction.gibbs)
+            self.assertAlmostEqual(delS[i], correction.entropy)
+        delH, delG, delS = self.database.getSolvationCorrections([], solventData)
+        self.assertEqual((len(delH), len(delG), len(delS)), (0, 0, 0))
+
     def testInitialSpecies(self):
         " Test we can check whether the solvent is listed as one of the initial species in various scenarios "
 
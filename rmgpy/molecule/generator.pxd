@@ -21,7 +21,7 @@ cpdef toOBMol(Molecule mol, bint returnMapping=*)
 
 cpdef toRDKitMol(Molecule mol, bint removeHs=*, bint returnMapping=*, bint sanitize=*)
 
-cpdef bint is_valid_combo(list combo, Molecule mol, list distances)
+cpdef bint is_valid_combo(list combo, dict adjacency, dict shortest, list distances)
 
 cpdef list find_lowest_u_layer(Molecule mol, list u_layer, list equivalent_atoms)
 
@@ -29,6 +29,10 @@ cpdef Molecule generate_minimum_resonance_isomer(Molecule mol)
 
 cpdef list get_unpaired_electrons(Molecule mol)
 
-cpdef list compute_agglomerate_distance(list agglomerates, Molecule mol)
+cpdef list compute_agglomerate_distance(list agglomerates, dict adjacency, dict shortest)
+
+cpdef dict get_adjacency_map(Molecule mol)
+
+cpdef dict get_shortest_distances(int source, dict adjacency, dict shortest)
 
 cpdef str create_P_layer(Molecule mol, str auxinfo)
\ No newline at end of file
@@ -4,6 +4,8 @@ import cython
 import logging
 import itertools
 import sys
+import threading
+from collections import OrderedDict
 
 # local imports
 try:
@@ -13,7 +15,6 @@ except:
 from rdkit import Chem
 
 from .molecule import Atom, Bond, Molecule
-from .pathfinder import compute_atom_distance
 from .util import partition, agglomerate, generate_combo
 
 import rmgpy.molecule.element as element
@@ -55,6 +56,61 @@ _known_smiles_radicals = {
                  'O2': '[O][O]',
              }
 
+#: OpenBabel and RDKit bond types, keyed by the bond order.
+_ob_bond_orders = {1: 1, 2: 2, 3: 3, 1.5: 5}
+_rd_bond_orders = {
+                 1: Chem.rdchem.BondType.SINGLE,
+                 2: Chem.rdchem.BondType.DOUBLE,
+                 3: Chem.rdchem.BondType.TRIPLE,
+                 1.5: Chem.rdchem.BondType.AROMATIC,
+             }
+
+#: The most recently generated InChI strings, keyed by the signature of the molecule.
+_inchi_cache = OrderedDict()
+_inchi_cache_size = 4096
+
+def _get_signature(mol):
+    """
+    Return a hashable tuple that describes everything about the (sorted)
+    molecule `mol` that is used when converting it to an InChI: the multiplicity,
+    the element, charge, radical electrons and lone pairs of each atom in order,
+    and the bonds between them by atom index.
+    """
+    mol.sortAtoms()
+    atoms = mol.vertices
+    indices = {}
+    for index, atom in enumerate(atoms):
+        indices[atom] = index
+    atom_signature = tuple([(atom.element.number, atom.element.isotope, atom.charge, atom.radicalElectrons, atom.lonePairs)
+                            for atom in atoms])
+    bond_signature = tuple(sorted([(indices[atom1], indices[atom2], bond.order)
+                                   for atom1 in atoms for atom2, bond in atom1.edges.iteritems()
+                                   if indices[atom1] < indices[atom2]]))
+    return (mol.multiplicity, atom_signature, bond_signature)
+
+#: OpenBabel converters, created once per output format and options in each thread.
+_ob_conversions = threading.local()
+
+def _get_ob_conversion(out_format, options):
+    """
+    Return an OpenBabel ``OBConversion`` that writes the format `out_format`
+    with each of the single-letter output `options` set. The converter is created on
+    first use in the current thread and reused afterwards.
+    """
+    try:
+        conversions = _ob_conversions.conversions
+    except AttributeError:
+        conversions = _ob_conversions.conversions = {}
+    try:
+        return conversions[(out_format, options)]
+    except KeyError:
+        obConversion = openbabel.OBConversion()
+        obConversion.SetOutFormat(out_format)
+        for option in options:
+            obConversion.SetOptions(option, openbabel.OBConversion.OUTOPTIONS)
+        conversions[(out_format, options)] = obConversion
+        return obConversion
+
 def toInChI(mol):
     """
     Convert a molecular structure to an InChI string. Uses
@@ -65,6 +121,24 @@ def toInChI(mol):
     
     Convert a molecular structure to an InChI string. Uses
     `OpenBabel <http://openbabel.org/>`_ to perform the conversion.
+
+    The most recently generated InChI strings are cached, so converting the
+    same structure again does not repeat the conversion.
+    """
+    signature = _get_signature(mol)
+    try:
+        inchi = _inchi_cache.pop(signature)
+    except KeyError:
+        inchi = _generate_inchi(mol)
+        if len(_inchi_cache) >= _inchi_cache_size:
+            _inchi_cache.popitem(last=False)
+    # (re)insert as the most recently used
+    _inchi_cache[signature] = inchi
+    return inchi
+
+def _generate_inchi(mol):
+    """
+    Convert a molecular structure to an InChI string, without using the cache.
     """
     try:
         if not Chem.inchi.INCHI_AVAILABLE:
@@ -75,9 +149,7 @@ def toInChI(mol):
         pass
 
     obmol = toOBMol(mol)
-    obConversion = openbabel.OBConversion()
-    obConversion.SetOutFormat('inchi')
-    obConversion.SetOptions('w', openbabel.OBConversion.OUTOPTIONS)
+    obConversion = _get_ob_conversion('inchi', ('w',))
     return obConversion.WriteString(obmol).strip()
 
 def create_U_layer(mol, auxinfo):
@@ -178,10 +250,7 @@ def toInChIKey(mol):
 #        for atom in mol.vertices:
 #           if atom.isNitrogen():
     obmol = toOBMol(mol)
-    obConversion = openbabel.OBConversion()
-    obConversion.SetOutFormat('inchi')
-    obConversion.SetOptions('w', openbabel.OBConversion.OUTOPTIONS)
-    obConversion.SetOptions('K', openbabel.OBConversion.OUTOPTIONS)
+    obConversion = _get_ob_conversion('inchi', ('w', 'K'))
     return obConversion.WriteString(obmol).strip()[:-2]
 
 def toAugmentedInChIKey(mol):
@@ -246,14 +315,9 @@ def toSMILES(mol):
         # It wasn't in the above list.
         pass
     for atom in mol.vertices:
-        if atom.isNitrogen():
+        if atom.element.number == 7:
             obmol = toOBMol(mol)
-            try:
-                SMILEwriter = openbabel.OBConversion()
-                SMILEwriter.SetOutFormat('smi')
-                SMILEwriter.SetOptions("i",SMILEwriter.OUTOPTIONS) # turn off isomer and stereochemistry information (the @ signs!)
-            except:
-                pass
+            SMILEwriter = _get_ob_conversion('smi', ('i',)) # turn off isomer and stereochemistry information (the @ signs!)
             return SMILEwriter.WriteString(obmol).strip()
 
     rdkitmol = toRDKitMol(mol, sanitize=False)
@@ -272,19 +336,20 @@ def toOBMol(mol, returnMapping=False):
     atoms = mol.vertices
 
     obAtomIds = {}  # dictionary of OB atom IDs
+    atomIndices = {}  # dictionary of atom positions in the sorted atom list
     obmol = openbabel.OBMol()
-    for atom in atoms:
+    for index, atom in enumerate(atoms):
         a = obmol.NewAtom()
         a.SetAtomicNum(atom.number)
         a.SetFormalCharge(atom.charge)
         obAtomIds[atom] = a.GetId()
-    orders = {1: 1, 2: 2, 3: 3, 1.5: 5}
+        atomIndices[atom] = index
     for atom1 in mol.vertices:
         for atom2, bond in atom1.edges.iteritems():
-            index1 = atoms.index(atom1)
-            index2 = atoms.index(atom2)
+            index1 = atomIndices[atom1]
+            index2 = atomIndices[atom2]
             if index1 < index2:
-                order = orders[bond.order]
+                order = _ob_bond_orders[bond.order]
                 obmol.AddBond(index1+1, index2+1, order)
 
     obmol.AssignSpinMultiplicity(True)
@@ -336,8 +401,10 @@ def toRDKitMol(mol, removeHs=True, returnMapping=False, sanitize=True):
     mol.sortAtoms()           
     atoms = mol.vertices
     rdAtomIndices = {} # dictionary of RDKit atom indices
-    rdkitmol = Chem.rdchem.EditableMol(Chem.rdchem.Mol())
+    atomIndices = {} # dictionary of atom positions in the sorted atom list
+    rdkitmol = Chem.rdchem.RWMol(Chem.rdchem.Mol())
     for index, atom in enumerate(mol.vertices):
+        atomIndices[atom] = index
         rdAtom = Chem.rdchem.Atom(atom.element.symbol)
         rdAtom.SetNumRadicalElectrons(atom.radicalElectrons)
         if atom.element.symbol == 'C' and atom.lonePairs == 1 and mol.multiplicity == 1: rdAtom.SetNumRadicalElectrons(2)
@@ -347,18 +414,16 @@ def toRDKitMol(mol, removeHs=True, returnMapping=False, sanitize=True):
         else:
             rdAtomIndices[atom] = index
     
-    rdBonds = Chem.rdchem.BondType
-    orders = {1: rdBonds.SINGLE, 2: rdBonds.DOUBLE, 3: rdBonds.TRIPLE, 1.5: rdBonds.AROMATIC}
     # Add the bonds
     for atom1 in mol.vertices:
         for atom2, bond in atom1.edges.iteritems():
-            index1 = atoms.index(atom1)
-            index2 = atoms.index(atom2)
+            index1 = atomIndices[atom1]
+            index2 = atomIndices[atom2]
             if index1 < index2:
-                order = orders[bond.order]
+                order = _rd_bond_orders[bond.order]
                 rdkitmol.AddBond(index1, index2, order)
     
-    # Make editable mol into a mol and rectify the molecule
+    # Make the read/write mol into a mol and rectify the molecule
     rdkitmol = rdkitmol.GetMol()
     if sanitize:
         Chem.SanitizeMol(rdkitmol)
@@ -368,7 +433,7 @@ def toRDKitMol(mol, removeHs=True, returnMapping=False, sanitize=True):
         return rdkitmol, rdAtomIndices
     return rdkitmol
 
-def is_valid_combo(combo, mol, distances):
+def is_valid_combo(combo, adjacency, shortest, distances):
     """
     Check if the combination of atom indices refers to
     atoms that are adjacent in the molecule.
@@ -382,7 +447,7 @@ def is_valid_combo(combo, mol, distances):
 
     # compute shortest path between atoms 
     agglomerates = agglomerate(combo)
-    new_distances = compute_agglomerate_distance(agglomerates, mol)
+    new_distances = compute_agglomerate_distance(agglomerates, adjacency, shortest)
 
     # combo is valid if the distance is equal to the parameter distance
 
@@ -424,10 +489,29 @@ def find_lowest_u_layer(mol, u_layer, equivalent_atoms):
         orig_distances=list,
         selected_group=list,
         combo=list,
+        flat_combo=list,
+        equivalent_set=set,
+        index=int,
+        adjacency=dict,
+        shortest=dict,
         )
     if not equivalent_atoms:
         return u_layer
 
+    # nothing to permute if none of the unpaired electrons sits on an equivalent atom
+    equivalent_set = set(itertools.chain.from_iterable(equivalent_atoms))
+    for index in u_layer:
+        if index in equivalent_set:
+            break
+    else:
+        return sorted(u_layer)
+
+    # a single unpaired electron can be moved to any atom equivalent to its own
+    if len(u_layer) == 1:
+        for e_layer in equivalent_atoms:
+            if u_layer[0] in e_layer:
+                return [min(e_layer)]
+
     new_u_layer = []
 
     grouped_electrons, corresponding_E_layers = partition(u_layer, equivalent_atoms)
@@ -441,19 +525,24 @@ def find_lowest_u_layer(mol, u_layer, equivalent_atoms):
 
 
     combos = generate_combo(grouped_electrons, corresponding_E_layers)
+
+    # the bonds and the distances between atoms are shared by all combos:
+    adjacency = get_adjacency_map(mol)
+    shortest = {}
+
     # compute original distance:
     orig_agglomerates = agglomerate(grouped_electrons)
-    orig_distances = compute_agglomerate_distance(orig_agglomerates, mol)
+    orig_distances = compute_agglomerate_distance(orig_agglomerates, adjacency, shortest)
 
     # deflate the list of lists to be able to numerically compare them
     selected_group = sorted(itertools.chain.from_iterable(grouped_electrons))
 
     # see if any of the combos is valid and results in a lower numerical combination than the original 
     for combo in combos:    
-        if is_valid_combo(combo, mol, orig_distances):
-            combo = sorted(itertools.chain.from_iterable(combo))
-            if combo < selected_group:
-                selected_group = combo
+        flat_combo = sorted(itertools.chain.from_iterable(combo))
+        # only check the validity of combos that would lower the current selection:
+        if flat_combo < selected_group and is_valid_combo(combo, adjacency, shortest, orig_distances):
+            selected_group = flat_combo
 
     # add the minimized unpaired electron positions to the u-layer:
     new_u_layer.extend(selected_group)
@@ -473,24 +562,13 @@ def generate_minimum_resonance_isomer(mol):
 
     cython.declare(
         candidates=list,
-        sel=Molecule,
-        cand=Molecule,
-        metric_sel=list,
-        metric_cand=list,
         )
 
 
     candidates = resonance.generateIsomorphicResonanceStructures(mol)
-    
-    sel = candidates[0]
-    metric_sel = get_unpaired_electrons(sel)
-    for cand in candidates[1:]:
-       metric_cand = get_unpaired_electrons(cand)
-       if metric_cand < metric_sel:
-            sel = cand
-            metric_sel = metric_cand
 
-    return sel
+    # min() keeps the first of several candidates with the same metric
+    return min(candidates, key=get_unpaired_electrons)
 
 
 def get_unpaired_electrons(mol):
@@ -509,29 +587,98 @@ def get_unpaired_electrons(mol):
         if at.radicalElectrons >= 1:
             locations.append(index)
 
-    return sorted(locations)  
+    # the indices are appended in increasing order, so the list is already sorted
+    return locations
 
-def compute_agglomerate_distance(agglomerates, mol):
+def compute_agglomerate_distance(agglomerates, adjacency, shortest):
     """
     Iterates over a list of lists containing atom indices.
     For each list the distances between the atoms is computed.
     A list of distances is returned.
 
+    The distances are looked up in `shortest`, which caches the
+    breadth-first distances from each atom in the `adjacency` map.
     """
 
     cython.declare(
         distances=list,
         agglomerate=list,
         dist=dict,
+        i1=int,
+        i2=int,
         )
 
     distances = []
     for agglomerate in agglomerates:
-        dist = compute_atom_distance(agglomerate, mol)
+        if len(agglomerate) == 1:
+            dist = {(agglomerate[0],): 0}
+        else:
+            dist = {}
+            for i1, i2 in itertools.combinations(sorted(agglomerate), 2):
+                dist[(i1, i2)] = get_shortest_distances(i1, adjacency, shortest)[i2]
         distances.append(dist)
 
     return distances
 
+def get_adjacency_map(mol):
+    """
+    Returns a dictionary that maps the 1-based index of each atom
+    to the list of 1-based indices of the atoms bonded to it.
+    """
+
+    cython.declare(
+        indices=dict,
+        adjacency=dict,
+        atom=Atom,
+        index=int,
+        )
+
+    indices = {}
+    for index, atom in enumerate(mol.atoms):
+        indices[atom] = index + 1
+
+    adjacency = {}
+    for atom, index in indices.iteritems():
+        adjacency[index] = [indices[neighbor] for neighbor in atom.edges]
+
+    return adjacency
+
+def get_shortest_distances(source, adjacency, shortest):
+    """
+    Returns a dictionary with the number of bonds on the shortest path
+    from the atom with 1-based index `source` to every atom reachable from it.
+
+    The result is stored in the `shortest` dictionary, keyed by `source`,
+    and reused on subsequent calls.
+    """
+
+    cython.declare(
+        distances=dict,
+        frontier=list,
+        next_frontier=list,
+        index=int,
+        neighbor=int,
+        )
+
+    try:
+        return shortest[source]
+    except KeyError:
+        pass
+
+    distances = {source: 0}
+    frontier = [source]
+    while frontier:
+        next_frontier = []
+        for index in frontier:
+            for neighbor in adjacency[index]:
+                if neighbor not in distances:
+                    distances[neighbor] = distances[index] + 1
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+
+    shortest[source] = distances
+    return distances
+
 def has_unexpected_lone_pairs(mol):
     """
     Iterates over the atoms of the Molecule and returns whether 
@@ -580,17 +727,17 @@ def create_augmented_layers(mol):
         molcopy = mol.copy(deep=True)
 
         hydrogens = filter(lambda at: at.number == 1, molcopy.atoms)
-        [molcopy.removeAtom(h) for h in hydrogens]
+        for h in hydrogens:
+            molcopy.removeAtom(h)
 
         rdkitmol = toRDKitMol(molcopy)
         _, auxinfo = Chem.MolToInchiAndAuxInfo(rdkitmol, options='-SNon')# suppress stereo warnings
         
         # extract the atom numbers from N-layer of auxiliary info:
         atom_indices = inchiutil.parse_N_layer(auxinfo)    
-        atom_indices = [atom_indices.index(i + 1) for i, atom in enumerate(molcopy.atoms)]
 
-        # sort the atoms based on the order of the atom indices
-        molcopy.atoms = [x for (y,x) in sorted(zip(atom_indices, molcopy.atoms), key=lambda pair: pair[0])]
+        # reorder the atoms so that the n-th atom is the one given as the n-th member of the N-layer
+        molcopy.atoms = [molcopy.atoms[i - 1] for i in atom_indices]
     
         ulayer = create_U_layer(molcopy, auxinfo)
 
@@ -6,6 +6,7 @@ from rmgpy.species import Species
 from .molecule import Atom, Molecule
 from .inchi import P_LAYER_PREFIX, U_LAYER_PREFIX
 from .generator import *
+import rmgpy.molecule.generator as generator
 
 class RDKitTest(unittest.TestCase):
     def testDebugger(self):
@@ -382,6 +383,86 @@ multiplicity 3
         aug_inchi = 'InChI=1S/C5H6/c1-3-5-4-2/h1-3H2/u1,2/lp4,5'
         self.compare(adjlist, aug_inchi)
 
+class InChICacheTest(unittest.TestCase):
+    def setUp(self):
+        self.generate_inchi = generator._generate_inchi
+        self.cache_size = generator._inchi_cache_size
+        self.converted = []
+        generator._inchi_cache.clear()
+
+    def tearDown(self):
+        generator._generate_inchi = self.generate_inchi
+        generator._inchi_cache_size = self.cache_size
+        generator._inchi_cache.clear()
+
+    def count_conversions(self, mol):
+        """
+        Stand-in for _generate_inchi that records the formula of every
+        structure that is actually converted.
+        """
+        self.converted.append(mol.getFormula())
+        return self.generate_inchi(mol)
+
+    def test_repeated_conversion(self):
+        """
+        Test that converting the same structure twice gives the same InChI,
+        and that a different structure with the same atoms does not reuse it.
+        """
+        ethanol = Molecule().fromSMILES('CCO')
+        inchi = toInChI(ethanol)
+        self.assertEqual(inchi, 'InChI=1S/C2H6O/c1-2-3/h3H,2H2,1H3')
+        self.assertEqual(toInChI(Molecule().fromSMILES('CCO')), inchi)
+        self.assertEqual(toInChI(Molecule().fromSMILES('COC')), 'InChI=1S/C2H6O/c1-3-2/h1-2H3')
+
+    def test_cache_hit(self):
+        """
+        Test that converting an identical structure again does not generate
+        the InChI again.
+        """
+        inchi = toInChI(Molecule().fromSMILES('CCO'))
+        def fail(mol):
+            self.fail('InChI regenerated for a structure that is already cached')
+        generator._generate_inchi = fail
+        self.assertEqual(toInChI(Molecule().fromSMILES('CCO')), inchi)
+
+    def test_cache_size(self):
+        """
+        Test that the cache never holds more than _inchi_cache_size entries.
+        """
+        generator._inchi_cache_size = 2
+        for smiles in ['C', 'CC', 'CCC', 'CCCC']:
+            toInChI(Molecule().fromSMILES(smiles))
+            self.assertTrue(len(generator._inchi_cache) <= 2)
+        self.assertEqual(len(generator._inchi_cache), 2)
+
+    def test_least_recently_used_eviction(self):
+        """
+        Test that the least recently used structure is evicted when the cache
+        is full.
+        """
+        generator._inchi_cache_size = 2
+        generator._generate_inchi = self.count_conversions
+        for smiles in ['C', 'CC', 'C', 'CCC']:
+            toInChI(Molecule().fromSMILES(smiles))
+        # methane was used more recently than ethane, so ethane was evicted
+        self.assertEqual(self.converted, ['CH4', 'C2H6', 'C3H8'])
+        toInChI(Molecule().fromSMILES('C'))
+        self.assertEqual(self.converted, ['CH4', 'C2H6', 'C3H8'])
+        toInChI(Molecule().fromSMILES('CC'))
+        self.assertEqual(self.converted, ['CH4', 'C2H6', 'C3H8', 'C2H6'])
+
+class AgglomerateDistanceTest(unittest.TestCase):
+    def test_3_atoms(self):
+        mol = Molecule().fromSMILES('CCC')
+        adjacency = get_adjacency_map(mol)
+        distances = compute_agglomerate_distance([[3,1,2], [2]], adjacency, {})
+
+        expected = [
+                    {(1,2): 1, (1,3): 2, (2,3): 1},
+                    {(2,): 0},
+                    ]
+        self.assertEquals(distances, expected)
+
 class ExpectedLonePairsTest(unittest.TestCase):
 
     def test_SingletCarbon(self):
@@ -17,6 +17,8 @@ cpdef list generateN5dd_N5tsResonanceStructures(Molecule mol)
 
 cpdef list generateIsomorphicResonanceStructures(Molecule mol)
 
+cpdef tuple _getIsomorphismInvariant(Molecule mol)
+
 cpdef list generateAromaticResonanceStructures(Molecule mol, dict features=?)
 
 cpdef list generateKekuleStructure(Molecule mol)
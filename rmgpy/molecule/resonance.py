@@ -628,6 +628,7 @@ def generateIsomorphicResonanceStructures(mol):
 
     cython.declare(isomer=Molecule,\
                    newIsomer=Molecule,\
+                   newIsomerCopy=Molecule,\
                    isom=Molecule
                    )
 
@@ -636,6 +637,10 @@ def generateIsomorphicResonanceStructures(mol):
     isomorphic_isomers = [mol]# resonance isomers that are isomorphic to the parameter isomer.
 
     isomers = [mol]
+    # Copies of the isomers grouped by an isomorphism invariant; only isomers
+    # in the same group need the full isomorphism check. The isomorphism check
+    # may reorder the atoms, so it is run on copies made once per isomer.
+    isomersByInvariant = {_getIsomorphismInvariant(mol): [mol.copy(deep=True)]}
 
     # Iterate over resonance isomers
     index = 0
@@ -648,18 +653,37 @@ def generateIsomorphicResonanceStructures(mol):
         
         for newIsomer in newIsomers:
             # Append to isomer list if unique
-            for isom in isomers:
-                if isom.copy(deep=True).isIsomorphic(newIsomer.copy(deep=True)):
+            invariant = _getIsomorphismInvariant(newIsomer)
+            candidates = isomersByInvariant.setdefault(invariant, [])
+            newIsomerCopy = newIsomer.copy(deep=True)
+            for isom in candidates:
+                if isom.isIsomorphic(newIsomerCopy):
                     isomorphic_isomers.append(newIsomer)
                     break
             else:
-                isomers.append(newIsomer)        
+                isomers.append(newIsomer)
+                candidates.append(newIsomerCopy)
                     
         # Move to next resonance isomer
         index += 1
 
     return isomorphic_isomers
 
+def _getIsomorphismInvariant(mol):
+    """
+    Return a hashable summary of `mol` that is the same for any two isomorphic
+    molecules: the multiplicity, and the sorted element, radical electrons,
+    lone pairs, charge, and bond orders of each atom. Molecules with different
+    invariants cannot be isomorphic.
+    """
+    descriptors = []
+    for atom in mol.vertices:
+        orders = sorted([bond.getOrderNum() for bond in atom.edges.itervalues()])
+        descriptors.append((atom.element.number, atom.element.isotope, atom.radicalElectrons,
+                            atom.lonePairs, atom.charge, tuple(orders)))
+    descriptors.sort()
+    return (mol.multiplicity, tuple(descriptors))
+
 
 def generateClarStructures(mol):
     """
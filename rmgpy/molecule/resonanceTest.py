@@ -4,7 +4,29 @@ from external.wip import work_in_progress
 from .molecule import Molecule
 
 from .resonance import *
-from .resonance import _clarOptimization, _clarTransformation
+from .resonance import _clarOptimization, _clarTransformation, _getIsomorphismInvariant
+
+def generateIsomorphicResonanceStructuresByPairs(mol):
+    """
+    Reference for :func:`generateIsomorphicResonanceStructures` that compares
+    each new resonance isomer with every isomer found so far.
+    """
+    isomorphic_isomers = [mol]
+    isomers = [mol]
+    index = 0
+    while index < len(isomers):
+        newIsomers = []
+        for algo in populateResonanceAlgorithms():
+            newIsomers.extend(algo(isomers[index]))
+        for newIsomer in newIsomers:
+            for isom in isomers:
+                if isom.copy(deep=True).isIsomorphic(newIsomer.copy(deep=True)):
+                    isomorphic_isomers.append(newIsomer)
+                    break
+            else:
+                isomers.append(newIsomer)
+        index += 1
+    return isomorphic_isomers
 
 class ResonanceTest(unittest.TestCase):
 
@@ -13,6 +35,30 @@ class ResonanceTest(unittest.TestCase):
         molList = generateResonanceStructures(Molecule(SMILES="C=C[CH]C=CC"))
         self.assertEqual(len(molList), 3)
 
+    def testIsomorphismInvariant(self):
+        """Test that isomorphic molecules share an isomorphism invariant, but that sharing one does not imply isomorphism"""
+        allyl1 = Molecule(SMILES="C=C[CH2]")
+        allyl2 = Molecule(SMILES="[CH2]C=C")
+        self.assertEqual(_getIsomorphismInvariant(allyl1), _getIsomorphismInvariant(allyl2))
+        self.assertNotEqual(_getIsomorphismInvariant(allyl1), _getIsomorphismInvariant(Molecule(SMILES="C=CC")))
+        cyclohexane = Molecule(SMILES="C1CCCCC1")
+        methylcyclopentane = Molecule(SMILES="CC1CCCC1")
+        self.assertEqual(_getIsomorphismInvariant(cyclohexane), _getIsomorphismInvariant(methylcyclopentane))
+        self.assertFalse(cyclohexane.isIsomorphic(methylcyclopentane))
+
+    def testIsomorphicResonanceStructures(self):
+        """Test that grouping by isomorphism invariant gives the same isomorphic resonance structures as comparing all pairs"""
+        for smiles in ["C=C[CH2]", "C1=C[CH]C=C1", "C=C[CH]C=CC", "[CH2]C=CC=C[CH2]", "CC=N[O]"]:
+            mol = Molecule(SMILES=smiles)
+            expected = generateIsomorphicResonanceStructuresByPairs(mol.copy(deep=True))
+            molList = generateIsomorphicResonanceStructures(mol)
+            self.assertEqual([isomer.toAdjacencyList() for isomer in molList],
+                             [isomer.toAdjacencyList() for isomer in expected])
+            for isomer in molList:
+                self.assertTrue(isomer.isIsomorphic(mol))
+        # the second allyl structure duplicates the first
+        self.assertEqual(len(generateIsomorphicResonanceStructures(Molecule(SMILES="C=C[CH2]"))), 2)
+
     def testOxime(self):
         """Test resonance structure generation for CC=N[O] radical
 
@@ -60,14 +60,17 @@ def partition(sample, list_of_samples):
     """
 
     partitions, sample_lists  = [], []
+    # position in partitions of each list of samples found so far, keyed by the list's id:
+    indices = {}
 
     for s in sample:
         for one_sample_list in list_of_samples:
             if s in one_sample_list:
                 try:
-                    index = sample_lists.index(one_sample_list)
+                    index = indices[id(one_sample_list)]
                     partitions[index].append(s)
-                except ValueError:
+                except KeyError:
+                    indices[id(one_sample_list)] = len(partitions)
                     partitions.append([s])
                     sample_lists.append(one_sample_list)                    
                 
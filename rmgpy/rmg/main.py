@@ -304,6 +304,7 @@ class RMG(util.Subject):
             kineticsDepositories = self.kineticsDepositories,
             #frequenciesLibraries = self.statmechLibraries,
             depository = False, # Don't bother loading the depository information, as we don't use it
+            solvationCachePath = os.path.join(self.outputDirectory, 'solvation.pkl'),
         )
         
         #check libraries
@@ -34,10 +34,13 @@ def runThermoEstimator(inputFile):
     rmg.database.loadThermo(os.path.join(path, 'thermo'), rmg.thermoLibraries, depository=False)
    
     if rmg.solvent:
-        rmg.database.loadSolvation(os.path.join(path, 'solvation'))
+        rmg.database.loadSolvation(os.path.join(path, 'solvation'),
+                                   cachePath=os.path.join(rmg.outputDirectory, 'solvation.pkl'))
         Species.solventData = rmg.database.solvation.getSolventData(rmg.solvent)
         Species.solventName = rmg.solvent
 
+    # Submit every species before collecting any result, so that in a
+    # parallel run the workers stay busy while the output files are written
     for species in rmg.initialSpecies:
         submit(species)
 